@@ -0,0 +1,170 @@
+import argparse
+import json
+import math
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# python coordinator.py --db leases.db --port 8765
+
+
+class LeaseStore:
+    """以SQLite保存账号租约，保证同一时刻每个账号最多由一个节点持有
+
+    节点定期调用claim续约并领取空闲或已过期的账号，领取数量不超过按活跃节点数均分的份额，
+    正在处理中的账号不会被收回。新节点加入时其他节点要到下次续约才会交还多出的账号，
+    期间claim返回的waiting为True，节点应继续等待而不是结束
+    """
+
+    def __init__(self, db_path: str | Path):
+        self.__db_path = str(db_path)
+        self.__lock = threading.Lock()
+        with self.__connect() as db:
+            db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS accounts (username TEXT PRIMARY KEY);
+                CREATE TABLE IF NOT EXISTS nodes (
+                    node TEXT PRIMARY KEY, last_seen REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS leases (
+                    username TEXT PRIMARY KEY,
+                    node TEXT NOT NULL,
+                    expires REAL NOT NULL
+                );
+                """
+            )
+
+    @contextmanager
+    def __connect(self):
+        with closing(
+            sqlite3.connect(self.__db_path, timeout=30, isolation_level=None)
+        ) as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            yield db
+
+    def claim(
+        self, node: str, usernames: list[str], busy: list[str], ttl: float
+    ) -> dict:
+        """续约并领取账号，返回该节点当前持有的账号，以及是否还有账号等待其他节点交还"""
+        now = time.time()
+        with self.__lock, self.__connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.executemany(
+                    "INSERT OR IGNORE INTO accounts VALUES (?)",
+                    [(username,) for username in usernames],
+                )
+                db.execute("INSERT OR REPLACE INTO nodes VALUES (?, ?)", (node, now))
+                db.execute("DELETE FROM leases WHERE expires <= ?", (now,))
+                db.execute("DELETE FROM nodes WHERE last_seen <= ?", (now - ttl,))
+
+                (total,) = db.execute("SELECT COUNT(*) FROM accounts").fetchone()
+                (nodes,) = db.execute("SELECT COUNT(*) FROM nodes").fetchone()
+                share = math.ceil(total / max(nodes, 1))
+
+                held = [
+                    username
+                    for (username,) in db.execute(
+                        "SELECT username FROM leases WHERE node = ?", (node,)
+                    )
+                ]
+                # 节点数增加后交还超出份额的空闲账号
+                surplus = len(held) - share
+                for username in sorted(held, key=lambda u: u in busy):
+                    if surplus <= 0:
+                        break
+                    if username not in busy:
+                        db.execute("DELETE FROM leases WHERE username = ?", (username,))
+                        held.remove(username)
+                        surplus -= 1
+
+                for username in usernames:
+                    if len(held) >= share:
+                        break
+                    if username in held:
+                        continue
+                    cursor = db.execute(
+                        "INSERT OR IGNORE INTO leases VALUES (?, ?, ?)",
+                        (username, node, now + ttl),
+                    )
+                    if cursor.rowcount:
+                        held.append(username)
+
+                db.execute(
+                    "UPDATE leases SET expires = ? WHERE node = ?", (now + ttl, node)
+                )
+                waiting = len(held) < share and any(
+                    count > share
+                    for (count,) in db.execute(
+                        "SELECT COUNT(*) FROM leases WHERE node != ? GROUP BY node",
+                        (node,),
+                    )
+                )
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return {"held": held, "waiting": waiting}
+
+    def release(self, node: str):
+        with self.__lock, self.__connect() as db:
+            db.execute("DELETE FROM leases WHERE node = ?", (node,))
+            db.execute("DELETE FROM nodes WHERE node = ?", (node,))
+
+
+class CoordinatorHandler(BaseHTTPRequestHandler):
+    store: LeaseStore
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        try:
+            match self.path:
+                case "/claim":
+                    data = self.store.claim(
+                        body["node"], body["usernames"], body["busy"], body["ttl"]
+                    )
+                case "/release":
+                    data = self.store.release(body["node"])
+                case _:
+                    self.send_error(404)
+                    return
+        except Exception as e:
+            self.__reply(500, {"code": 1, "msg": str(e), "data": None})
+        else:
+            self.__reply(200, {"code": 0, "msg": "", "data": data})
+
+    def __reply(self, status: int, response: dict):
+        content = json.dumps(response, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(db_path: str, host: str = "0.0.0.0", port: int = 8765):
+    CoordinatorHandler.store = LeaseStore(db_path)
+    server = ThreadingHTTPServer((host, port), CoordinatorHandler)
+    print(f"租约协调服务已启动：{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--db", default="leases.db")
+    arg_parser.add_argument("--host", default="0.0.0.0")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    args = arg_parser.parse_args()
+    serve(args.db, args.host, args.port)
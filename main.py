@@ -1,33 +1,116 @@
-from selenium import webdriver
-from selenium.webdriver.remote.webelement import WebElement
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.common.exceptions import StaleElementReferenceException
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import pypandoc
-import requests
-import json
+from __future__ import annotations
+
 import time
+
+STARTUP_BEGIN = time.perf_counter()
+
+import json
 import os
 from copy import copy
 from pathlib import Path
 from typing import overload, Sequence, Callable, Any
-from PIL import Image
 from io import BytesIO
 import base64
 from difflib import SequenceMatcher
-import inquirer
 import toml
 import logging
-from selenium.webdriver.remote.remote_connection import LOGGER
 import shutil
 import zipfile
 import math
 import random
+import argparse
+import importlib
+import threading
+import queue
+import signal
+from datetime import date, datetime
+from contextlib import contextmanager
+import functools
+import socket
+import heapq
+import itertools
+from policies import (
+    CircuitBreaker,
+    RetryExhaustedException,
+    RetryPolicy,
+    ReviewHistory,
+    RunStats,
+)
 
 # pyinstaller main.py --onefile --copy-metadata readchar
 
+arg_parser = argparse.ArgumentParser()
+arg_parser.add_argument(
+    "--profile-startup", action="store_true", help="统计模块导入与首次登录耗时"
+)
+arg_parser.add_argument(
+    "--daemon", action="store_true", help="以无界面守护模式持续轮询并发布文章"
+)
+arg_parser.add_argument(
+    "--trace", action="store_true", help="按阶段记录浏览器性能指标与网络请求"
+)
+cli_args = arg_parser.parse_args()
+
+startup_marks: dict[str, float] = {}
+import_costs: dict[str, float] = {}
+
+
+def mark_startup(name: str):
+    if name not in startup_marks:
+        startup_marks[name] = time.perf_counter() - STARTUP_BEGIN
+
+
+def report_startup():
+    if not cli_args.profile_startup:
+        return
+    print("启动耗时统计：")
+    for name, cost in startup_marks.items():
+        print(f"  {name}：{cost:.3f}s")
+    print("模块导入耗时：")
+    for name, cost in import_costs.items():
+        print(f"  {name}：{cost:.3f}s")
+
+
+class LazyImport:
+    """首次使用时才导入模块（或模块中的对象），以缩短启动时间"""
+
+    def __init__(self, module: str, attr: str | None = None):
+        self.__module = module
+        self.__attr = attr
+        self.__target = None
+
+    def __resolve(self):
+        if self.__target is None:
+            t = time.perf_counter()
+            target = importlib.import_module(self.__module)
+            if self.__attr is not None:
+                target = getattr(target, self.__attr)
+            name = self.__module + (f".{self.__attr}" if self.__attr else "")
+            import_costs[name] = time.perf_counter() - t
+            self.__target = target
+        return self.__target
+
+    def __getattr__(self, name: str):
+        return getattr(self.__resolve(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self.__resolve()(*args, **kwargs)
+
+
+webdriver = LazyImport("selenium.webdriver")
+WebElement = LazyImport("selenium.webdriver.remote.webelement", "WebElement")
+By = LazyImport("selenium.webdriver.common.by", "By")
+Keys = LazyImport("selenium.webdriver.common.keys", "Keys")
+WebDriverWait = LazyImport("selenium.webdriver.support.ui", "WebDriverWait")
+EC = LazyImport("selenium.webdriver.support.expected_conditions")
+LOGGER = LazyImport("selenium.webdriver.remote.remote_connection", "LOGGER")
+selenium_exceptions = LazyImport("selenium.common.exceptions")
+pypandoc = LazyImport("pypandoc")
+requests = LazyImport("requests")
+Image = LazyImport("PIL.Image")
+inquirer = LazyImport("inquirer")
+psutil = LazyImport("psutil")
+
 
 try:
     config = toml.load("config.toml")
@@ -59,12 +142,78 @@ try:
         TEMP_FOLDER.mkdir()
 
     SHOW_WINDOW = config["show_window"]
+
+    PREWARM_DRIVER = config.get("prewarm_driver", False)
+
+    TRACE = cli_args.trace or config.get("trace", False)
+    TRACE_FOLDER = Path(config.get("trace_folder", "traces"))
+    if TRACE and not TRACE_FOLDER.exists():
+        TRACE_FOLDER.mkdir()
+
+    MAX_DRIVER_RESTARTS = config.get("max_driver_restarts", 10)
+    RECYCLE_MEMORY_MB = config.get("recycle_memory_mb", 2048)
+    RECYCLE_ARTICLES = config.get("recycle_articles", 0)
+    MEMORY_LOG_FILE = Path(config.get("memory_log_file", "memory_log.csv"))
+
+    COORDINATOR_URL = config.get("coordinator_url")
+    COORDINATOR_DB = config.get("coordinator_db")
+    NODE_ID = config.get("node_id", f"{socket.gethostname()}-{os.getpid()}")
+    LEASE_TTL = config.get("lease_ttl", 60)
+
+    DAEMON_WORKERS = config.get("daemon_workers", 1)
+    DAEMON_POLL_INTERVAL = config.get("daemon_poll_interval", 30)
+    DAEMON_MAX_POLL_INTERVAL = config.get("daemon_max_poll_interval", 300)
+
+    retry_config = config.get("retry", {})
+    RETRY_MAX_ATTEMPTS = retry_config.get("max_attempts", 5)
+    RETRY_BASE_DELAY = retry_config.get("base_delay", 2)
+    RETRY_MAX_DELAY = retry_config.get("max_delay", 60)
+    INTERCEPT_MAX_ATTEMPTS = retry_config.get("intercept_max_attempts", 5)
+    REVIEW_TIMEOUT = retry_config.get("review_timeout", 3600)
+    TEMP_REVIEW_INTERVAL = config.get("temp_review_interval", 5)
+    FINAL_REVIEW_INTERVAL = config.get("final_review_interval", 3)
+    REVIEW_MAX_INTERVAL = config.get("review_max_interval", 120)
+    REVIEW_HISTORY_FILE = Path(config.get("review_history_file", "review_history.json"))
+    BREAKER_THRESHOLD = retry_config.get("breaker_threshold", 3)
+    BREAKER_COOLDOWN = retry_config.get("breaker_cooldown", 1800)
+    BREAKER_MAX_TRIPS = retry_config.get("breaker_max_trips", 3)
+    BREAKER_RESET = retry_config.get("breaker_reset", 86400)
 except Exception as e:
     print(f"初始化失败：{e}")
     os.system("pause")
     exit()
 
-driver: webdriver.Chrome | None = None
+driver_local = threading.local()
+
+
+class DriverProxy:
+    """将对全局driver的访问转发给当前线程持有的浏览器
+
+    调用中出现的浏览器会话失效统一转换为DriverCrashedException
+    """
+
+    def __getattr__(self, name: str):
+        try:
+            attr = getattr(driver_local.driver, name)
+        except Exception as e:
+            raise_if_driver_dead(e)
+            raise
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            try:
+                return attr(*args, **kwargs)
+            except Exception as e:
+                if not isinstance(e, selenium_exceptions.NoSuchElementException):
+                    raise_if_driver_dead(e)
+                raise
+
+        return call
+
+
+driver: webdriver.Chrome = DriverProxy()
 main_window_handle: str | None = None
 
 
@@ -73,6 +222,30 @@ class FindElementGenericTimeoutException(Exception):
         return "目标元素长时间未找到"
 
 
+class DriverCrashedException(Exception):
+    pass
+
+
+def driver_alive() -> bool:
+    wrapper: Driver | None = getattr(driver_local, "wrapper", None)
+    return wrapper is None or wrapper.is_alive()
+
+
+def raise_if_driver_dead(e: Exception):
+    """区分浏览器会话失效与普通的元素查找失败，前者抛出DriverCrashedException
+
+    除InvalidSessionIdException外都先向浏览器确认，避免将requests等其他连接错误误判为崩溃
+    """
+    if isinstance(e, DriverCrashedException):
+        raise e
+    if (
+        isinstance(e, selenium_exceptions.InvalidSessionIdException)
+        or not driver_alive()
+    ):
+        lines = str(e).strip().splitlines()
+        raise DriverCrashedException(lines[0] if lines else type(e).__name__) from e
+
+
 def find_element(
     by: By, value: str, root: WebElement | None = None, timeout: float | None = None
 ):
@@ -80,12 +253,14 @@ def find_element(
     while True:
         try:
             res = (root or driver).find_element(by, value)
-        except:
+        except Exception as e:
+            if not isinstance(e, selenium_exceptions.NoSuchElementException):
+                raise_if_driver_dead(e)
             if DEBUG:
                 print(f"element not found: {value} by {by} in {root}")
             if timeout is not None and (timeout == 0 or time.time() - t >= timeout):
                 return None
-            if timeout is None and time.time() - time > 20:
+            if timeout is None and time.time() - t > 20:
                 raise FindElementGenericTimeoutException()
             time.sleep(0.5)
         else:
@@ -99,13 +274,17 @@ def find_elements(
 ):
     t = time.time()
     while True:
-        res = (root or driver).find_elements(by, value)
+        try:
+            res = (root or driver).find_elements(by, value)
+        except Exception as e:
+            raise_if_driver_dead(e)
+            raise
         if len(res) == 0:
             if DEBUG:
                 print(f"element not found: {value} by {by} in {root}")
             if timeout is not None and (timeout == 0 or time.time() - t >= timeout):
                 return None
-            if timeout is None and time.time() - time > 20:
+            if timeout is None and time.time() - t > 20:
                 raise FindElementGenericTimeoutException()
             time.sleep(0.5)
         else:
@@ -140,7 +319,7 @@ def click_element(
 
 
 def click_element(*args, **kwargs) -> None:
-    element = args[0] if isinstance(args[0], WebElement) else find_element(*args)
+    element = find_element(*args) if isinstance(args[0], str) else args[0]
     kwargs.setdefault("scroll", True)
     kwargs.setdefault("timeout", None)
     if kwargs["timeout"]:
@@ -154,7 +333,8 @@ def click_element(*args, **kwargs) -> None:
                     "arguments[0].scrollIntoView({block:'center'})", element
                 )
             element.click()
-        except:
+        except Exception as e:
+            raise_if_driver_dead(e)
             time.sleep(0.5)
         else:
             if DEBUG:
@@ -163,24 +343,383 @@ def click_element(*args, **kwargs) -> None:
             return
 
 
+def current_username() -> str | None:
+    return getattr(driver_local, "username", None)
+
+
+class DriverTracer:
+    """通过CDP记录性能指标与网络请求，并标注所属的工作流阶段
+
+    每次运行写出一个jsonl明细文件，结束时另写一份汇总，列出各页面最慢与最大的请求
+    """
+
+    SUMMARY_SIZE = 10
+    # 长轮询、websocket等请求可能一直不结束，超过该秒数后不再跟踪
+    REQUEST_TIMEOUT = 300
+
+    def __init__(self, chrome: webdriver.Chrome):
+        self.__chrome = chrome
+        self.__stages: list[str] = []
+        self.__requests: dict[str, dict] = {}
+        # 只保留汇总所需的累计值与最慢、最大的请求，长时间运行时内存不随请求数增长
+        self.__pages: dict[str, dict] = {}
+        self.__stage_costs: dict[str, dict] = {}
+        self.__seq = itertools.count()
+        name = f"trace_{datetime.now():%Y%m%d_%H%M%S}_{threading.get_ident()}"
+        self.__trace_file = TRACE_FOLDER / f"{name}.jsonl"
+        self.__summary_file = TRACE_FOLDER / f"{name}_summary.json"
+        self.__output = self.__trace_file.open("w", encoding="utf-8")
+        chrome.execute_cdp_cmd("Performance.enable", {})
+        chrome.execute_cdp_cmd("Network.enable", {})
+
+    @property
+    def current_stage(self) -> str:
+        return self.__stages[-1] if self.__stages else "-"
+
+    def __write(self, record: dict):
+        self.__output.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def __metrics(self) -> dict[str, float]:
+        try:
+            metrics = self.__chrome.execute_cdp_cmd("Performance.getMetrics", {})
+        except Exception:
+            return {}
+        return {m["name"]: m["value"] for m in metrics["metrics"]}
+
+    @contextmanager
+    def stage(self, name: str):
+        self.collect()
+        self.__stages.append(name)
+        start_metrics = self.__metrics()
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - t
+            self.collect()
+            end_metrics = self.__metrics()
+            self.__stages.pop()
+            costs = self.__stage_costs.setdefault(
+                name, {"count": 0, "total": 0.0, "max": 0.0}
+            )
+            costs["count"] += 1
+            costs["total"] += duration
+            costs["max"] = max(costs["max"], duration)
+            self.__write(
+                {
+                    "type": "stage",
+                    "stage": name,
+                    "username": current_username(),
+                    "duration": round(duration, 3),
+                    "metrics": {
+                        key: round(value - start_metrics.get(key, 0), 3)
+                        for key, value in end_metrics.items()
+                        if key.endswith("Duration") or key.endswith("Count")
+                    },
+                    "js_heap": end_metrics.get("JSHeapUsedSize"),
+                }
+            )
+
+    def __push_top(self, heap: list, key: float, request: dict):
+        item = (key, next(self.__seq), request)
+        if len(heap) < self.SUMMARY_SIZE:
+            heapq.heappush(heap, item)
+        else:
+            heapq.heappushpop(heap, item)
+
+    def __finish(self, request: dict):
+        page = self.__pages.setdefault(
+            request["page"],
+            {"requests": 0, "bytes": 0, "slowest": [], "largest": []},
+        )
+        page["requests"] += 1
+        page["bytes"] += request["size"]
+        self.__push_top(page["slowest"], request["duration"], request)
+        self.__push_top(page["largest"], request["size"], request)
+        self.__write(request)
+
+    def __evict(self, now: float):
+        for request_id, request in list(self.__requests.items()):
+            if now - request["start"] > self.REQUEST_TIMEOUT:
+                del self.__requests[request_id]
+
+    def collect(self):
+        """读取浏览器性能日志中的网络事件"""
+        try:
+            entries = self.__chrome.get_log("performance")
+        except Exception:
+            return
+        for entry in entries:
+            message = json.loads(entry["message"])["message"]
+            params = message.get("params", {})
+            match message.get("method"):
+                case "Network.requestWillBeSent":
+                    self.__evict(params["timestamp"])
+                    self.__requests[params["requestId"]] = {
+                        "type": "request",
+                        "stage": self.current_stage,
+                        "page": params.get("documentURL", "").split("?")[0],
+                        "url": params["request"]["url"][:300],
+                        "method": params["request"]["method"],
+                        "start": params["timestamp"],
+                    }
+                case "Network.responseReceived":
+                    if request := self.__requests.get(params["requestId"]):
+                        response = params["response"]
+                        request["status"] = response.get("status")
+                        request["mime"] = response.get("mimeType")
+                        if timing := response.get("timing"):
+                            request["ttfb"] = round(
+                                (timing["receiveHeadersEnd"] - timing["sendStart"])
+                                / 1000,
+                                3,
+                            )
+                case "Network.loadingFinished" | "Network.loadingFailed":
+                    if request := self.__requests.pop(params["requestId"], None):
+                        request["duration"] = round(
+                            params["timestamp"] - request.pop("start"), 3
+                        )
+                        request["size"] = params.get("encodedDataLength", 0)
+                        if error := params.get("errorText"):
+                            request["error"] = error
+                        self.__finish(request)
+
+    def close(self):
+        self.collect()
+        self.__output.close()
+        summary = {
+            "stages": {
+                name: {
+                    "count": costs["count"],
+                    "total": round(costs["total"], 3),
+                    "max": round(costs["max"], 3),
+                }
+                for name, costs in self.__stage_costs.items()
+            },
+            "pages": {
+                page: {
+                    "requests": stats["requests"],
+                    "bytes": stats["bytes"],
+                    "slowest": [r for *_, r in sorted(stats["slowest"], reverse=True)],
+                    "largest": [r for *_, r in sorted(stats["largest"], reverse=True)],
+                }
+                for page, stats in self.__pages.items()
+            },
+        }
+        with self.__summary_file.open("w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"性能记录已保存至：{self.__trace_file}")
+
+
+@contextmanager
+def trace_stage(name: str):
+    tracer: DriverTracer | None = getattr(driver_local, "tracer", None)
+    if tracer is None:
+        yield
+        return
+    with tracer.stage(name):
+        yield
+
+
+def traced(name: str):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with trace_stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
 class Driver:
-    def __init__(self, driver: webdriver.Chrome):
-        self.__driver = driver
+    def __init__(self, factory: Callable[[], webdriver.Chrome], trace: bool = False):
+        self.__factory = factory
+        self.__trace = trace
+        self.__driver = factory()
+        self.__tracer = DriverTracer(self.__driver) if trace else None
+        self.restarts = 0
+        self.recycles = 0
+        self.articles = 0
+        self.started = time.time()
 
     def __enter__(self):
-        global driver
-        driver = self.__driver
+        driver_local.wrapper = self
+        driver_local.driver = self.__driver
+        driver_local.tracer = self.__tracer
 
     def __exit__(self, type, value, traceback):
-        global driver
-        driver = None
-        self.__driver.quit()
+        driver_local.wrapper = None
+        driver_local.driver = None
+        driver_local.tracer = None
+        self.quit()
+
+    def quit(self):
+        if self.__tracer is not None:
+            self.__tracer.close()
+            self.__tracer = None
+        try:
+            self.__driver.quit()
+        except Exception:
+            pass
 
     def content(self):
         return self.__driver
 
+    def is_alive(self) -> bool:
+        try:
+            self.__driver.execute_script("return 1")
+        except Exception:
+            return False
+        return True
+
+    def memory_usage(self) -> dict[str, float]:
+        """浏览器内存占用（MB）
 
-def create_driver(headless: bool = True, remain_browser: bool = False):
+        browser与renderer通过psutil统计chromedriver进程树，js_heap通过CDP获取，
+        未安装psutil时只有js_heap
+        """
+        usage = {}
+        try:
+            root = psutil.Process(self.__driver.service.process.pid)
+            browser = renderer = 0
+            for process in root.children(recursive=True):
+                try:
+                    rss = process.memory_info().rss
+                    cmdline = process.cmdline()
+                except psutil.Error:
+                    continue
+                browser += rss
+                if "--type=renderer" in cmdline:
+                    renderer += rss
+            usage["browser"] = browser / 2**20
+            usage["renderer"] = renderer / 2**20
+        except ImportError:
+            pass
+        except Exception as e:
+            if DEBUG:
+                print(f"进程内存统计失败：{e}")
+        try:
+            self.__driver.execute_cdp_cmd("Performance.enable", {})
+            metrics = self.__driver.execute_cdp_cmd("Performance.getMetrics", {})
+            for metric in metrics["metrics"]:
+                if metric["name"] == "JSHeapUsedSize":
+                    usage["js_heap"] = metric["value"] / 2**20
+        except Exception as e:
+            if DEBUG:
+                print(f"JS堆内存统计失败：{e}")
+        return usage
+
+    def restart(self, crashed: bool = True):
+        """结束浏览器并重新启动，crashed为False时表示定期回收"""
+        if crashed:
+            if self.restarts >= MAX_DRIVER_RESTARTS:
+                raise DriverCrashedException(f"浏览器已重启{self.restarts}次，放弃重启")
+            self.restarts += 1
+        else:
+            self.recycles += 1
+        self.articles = 0
+        self.started = time.time()
+        if self.__tracer is not None:
+            self.__tracer.close()
+        try:
+            self.__driver.quit()
+        except Exception:
+            pass
+        self.__driver = self.__factory()
+        self.__tracer = DriverTracer(self.__driver) if self.__trace else None
+        driver_local.driver = self.__driver
+        driver_local.tracer = self.__tracer
+
+
+def recover_driver(e: DriverCrashedException):
+    """重启崩溃的浏览器并恢复当前账号的登录状态"""
+    username = current_username()
+    print(f"浏览器会话失效（{e}），正在重启...")
+    t = time.time()
+    while True:
+        # 重启次数达到上限时restart会抛出DriverCrashedException
+        driver_local.wrapper.restart()
+        driver_local.username = None
+        if username is None:
+            break
+        try:
+            login(COOKIE_FOLDER / username)
+        except CookieExpiredException:
+            # 交由后续流程在重新登录时处理
+            break
+        except DriverCrashedException as login_error:
+            print(f"恢复登录时浏览器再次失效（{login_error}），正在重启...")
+        else:
+            break
+    lost = time.time() - t
+    print(f"浏览器已恢复，耗时{lost:.1f}秒")
+    run_stats.add("浏览器重启", username=username)
+    run_stats.add("浏览器重启耗时(秒)", lost, username=username)
+
+
+memory_log_lock = threading.Lock()
+
+
+def log_memory(wrapper: Driver, usage: dict[str, float]):
+    with memory_log_lock:
+        is_new = not MEMORY_LOG_FILE.exists()
+        with MEMORY_LOG_FILE.open("a", encoding="utf-8") as f:
+            if is_new:
+                f.write(
+                    "time,thread,username,uptime,articles,browser,renderer,js_heap\n"
+                )
+            f.write(
+                ",".join(
+                    [
+                        f"{datetime.now():%Y-%m-%d %H:%M:%S}",
+                        str(threading.get_ident()),
+                        current_username() or "",
+                        f"{time.time() - wrapper.started:.0f}",
+                        str(wrapper.articles),
+                        *(
+                            f"{usage[key]:.1f}" if key in usage else ""
+                            for key in ("browser", "renderer", "js_heap")
+                        ),
+                    ]
+                )
+                + "\n"
+            )
+
+
+def recycle_driver_if_needed():
+    """切换账号前采样浏览器内存，超过阈值时重启浏览器"""
+    wrapper: Driver | None = getattr(driver_local, "wrapper", None)
+    if wrapper is None:
+        return
+    usage = wrapper.memory_usage()
+    log_memory(wrapper, usage)
+    memory = usage.get("browser", usage.get("js_heap", 0))
+    if RECYCLE_MEMORY_MB and memory >= RECYCLE_MEMORY_MB:
+        reason = f"内存占用{memory:.0f}MB"
+    elif RECYCLE_ARTICLES and wrapper.articles >= RECYCLE_ARTICLES:
+        reason = f"已发布{wrapper.articles}篇文章"
+    else:
+        return
+    print(f"浏览器{reason}，正在重启以释放内存...")
+    t = time.time()
+    wrapper.restart(crashed=False)
+    # 新浏览器没有登录状态，由随后的登录流程恢复
+    driver_local.username = None
+    run_stats.add("浏览器回收", username="-")
+    run_stats.add("浏览器回收耗时(秒)", time.time() - t, username="-")
+
+
+def count_published_article():
+    wrapper: Driver | None = getattr(driver_local, "wrapper", None)
+    if wrapper is not None:
+        wrapper.articles += 1
+
+
+def create_chrome(
+    headless: bool = True, remain_browser: bool = False, trace: bool = TRACE
+):
     # 禁止将日志消息输出到控制台
     LOGGER.setLevel(logging.CRITICAL)
     logging.disable(logging.CRITICAL)
@@ -203,6 +742,8 @@ def create_driver(headless: bool = True, remain_browser: bool = False):
     )
     if remain_browser:
         options.add_experimental_option("detach", True)
+    if trace:
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
 
     service = webdriver.ChromeService(CHROME_DRIVER_PATH, log_output=os.devnull)
     _driver = webdriver.Chrome(options, service)
@@ -210,7 +751,44 @@ def create_driver(headless: bool = True, remain_browser: bool = False):
     #     "Page.addScriptToEvaluateOnNewDocument",
     #     {"source": open("stealth.min.js").read()},
     # )
-    return Driver(_driver)
+    return _driver
+
+
+def create_driver(
+    headless: bool = True, remain_browser: bool = False, trace: bool = TRACE
+):
+    return Driver(lambda: create_chrome(headless, remain_browser, trace), trace)
+
+
+class DriverPrewarmer:
+    """在用户选择菜单时于后台提前启动浏览器"""
+
+    def __init__(self, headless: bool = True):
+        self.__driver: Driver | None = None
+        self.__error: Exception | None = None
+        self.__thread = threading.Thread(
+            target=self.__run, args=(headless,), daemon=True
+        )
+        self.__thread.start()
+
+    def __run(self, headless: bool):
+        try:
+            self.__driver = create_driver(headless=headless)
+        except Exception as e:
+            self.__error = e
+
+    def take(self) -> Driver:
+        self.__thread.join()
+        if self.__error is not None:
+            raise self.__error
+        driver, self.__driver = self.__driver, None
+        return driver
+
+    def discard(self):
+        self.__thread.join()
+        if self.__driver is not None:
+            self.__driver.quit()
+            self.__driver = None
 
 
 def get_cookies(username: str):
@@ -227,11 +805,14 @@ class CookieExpiredException(Exception):
     pass
 
 
+@traced("login")
 def login(cookie_file: Path):
     if not cookie_file.exists():
         print(f"cookie file: {cookie_file.name} not found")
         exit()
+    driver_local.username = cookie_file.name
     driver.get(BJH_URL)
+    driver.delete_all_cookies()
     for cookie in json.load(open(cookie_file, "r")):
         driver.add_cookie(cookie)
     driver.get(BJH_URL)
@@ -245,7 +826,9 @@ def login(cookie_file: Path):
         )[0]
         == 0
     ):
+        driver_local.username = None
         raise CookieExpiredException()
+    mark_startup("首次登录")
 
 
 def upload_img(img_url: str):
@@ -273,7 +856,7 @@ def filter_file_name(s: str):
 
 
 def compress_docx_img(docx_path: Path):
-    temp_folder = TEMP_FOLDER / "temp_docx_content"
+    temp_folder = TEMP_FOLDER / f"{docx_path.stem}_content"
     file = zipfile.ZipFile(docx_path)
     file.extractall(temp_folder)
     img_folder = temp_folder / "word" / "media"
@@ -322,6 +905,7 @@ def clean_temp_folder():
         os.remove(file_path)
 
 
+@traced("select_covers")
 def select_covers(covers_idx: list[int], main_cover_idx: int):
     three_cover_radio = find_element(
         By.CSS_SELECTOR, '.cheetah-radio-input[value="three"]'
@@ -374,6 +958,7 @@ def PIL_base64(img: Image.Image, coding="utf-8"):
     return base64_str
 
 
+@traced("handle_spiner")
 def handle_spiner():
     print("正在处理验证码...")
     img_link = find_element(By.CLASS_NAME, "passMod_spin-background").get_attribute(
@@ -415,6 +1000,7 @@ def handle_spiner():
     action.release().perform()
 
 
+@traced("clean_editor")
 def clean_editor():
     title_textarea = find_element(
         By.CSS_SELECTOR, ".client_pages_edit_components_titleInput textarea"
@@ -443,6 +1029,49 @@ class PostLimitedException(Exception):
     pass
 
 
+class PostBannedException(Exception):
+    pass
+
+
+class ReviewTimeoutException(Exception):
+    pass
+
+
+class LeaseLostException(Exception):
+    pass
+
+
+run_stats = RunStats(current_username)
+
+
+FATAL_EXCEPTIONS = (PostLimitedException, PostBannedException, CookieExpiredException)
+
+
+def retry_policy(**kwargs) -> RetryPolicy:
+    """使用配置的重试参数，浏览器失效时不再重试"""
+    kwargs.setdefault("max_attempts", RETRY_MAX_ATTEMPTS)
+    kwargs.setdefault("base_delay", RETRY_BASE_DELAY)
+    kwargs.setdefault("max_delay", RETRY_MAX_DELAY)
+    return RetryPolicy(check=raise_if_driver_dead, stats=run_stats, **kwargs)
+
+
+RETRY_POLICIES = {
+    "发布临时文章": retry_policy(fatal=FATAL_EXCEPTIONS),
+    "撤回": retry_policy(fatal=(CookieExpiredException,)),
+    "修改": retry_policy(fatal=(PostBannedException, CookieExpiredException)),
+}
+
+INTERCEPT_POLICY = retry_policy(
+    max_attempts=INTERCEPT_MAX_ATTEMPTS, base_delay=15, max_delay=120
+)
+
+
+account_breaker = CircuitBreaker(
+    BREAKER_THRESHOLD, BREAKER_COOLDOWN, BREAKER_MAX_TRIPS, BREAKER_RESET, run_stats
+)
+
+
+@traced("post_article")
 def post_article(
     docx_path: str,
     title: str,
@@ -461,14 +1090,17 @@ def post_article(
     click_element(import_btn)
     time.sleep(1)
     print(f"上传文档：{docx_path}")
-    while True:
-        find_element(By.CSS_SELECTOR, ".import-doc-modal input").send_keys(docx_path)
-        if find_element(
-            By.XPATH,
-            "//span[contains(@class, 'cheetah-upload')]//*[contains(text(), '上传中')]",
-            timeout=1,
-        ):
-            break
+    with trace_stage("upload"):
+        while True:
+            find_element(By.CSS_SELECTOR, ".import-doc-modal input").send_keys(
+                docx_path
+            )
+            if find_element(
+                By.XPATH,
+                "//span[contains(@class, 'cheetah-upload')]//*[contains(text(), '上传中')]",
+                timeout=1,
+            ):
+                break
 
     print("修改标题...")
     title_textarea = find_element(
@@ -486,7 +1118,8 @@ def post_article(
     select_covers(covers_idx, main_cover_idx)
     print("封面设置完成")
 
-    while True:
+    intercepts = 0
+    for attempt in range(1, INTERCEPT_POLICY.max_attempts + 1):
         if random.randint(0, 1):
             driver.execute_script("arguments[0].click()", publish_btn)
         else:
@@ -499,8 +1132,12 @@ def post_article(
         ):
             print(f"发布被拦截，消息：{msg.text}")
             if "请勿修改过多内容" in msg.text:
-                raise Exception("被制裁辣！！")
-            time.sleep(15)
+                raise PostBannedException("被制裁辣！！")
+            intercepts += 1
+            if intercepts >= INTERCEPT_POLICY.max_attempts:
+                raise Exception(f"发布多次被拦截：{msg.text}")
+            run_stats.add("发布拦截重试")
+            time.sleep(INTERCEPT_POLICY.delay(intercepts))
             click_element(publish_btn)
 
         if find_element_options(
@@ -508,6 +1145,8 @@ def post_article(
             timeout=3,
         ):
             break
+    else:
+        raise Exception("点击发布后无响应")
 
     while True:
         idx, ele = find_element_options(
@@ -534,6 +1173,7 @@ def get_article_content_item(title: str):
     raise Exception("target_item not found")
 
 
+@traced("check_article_status")
 def check_article_status(title: str) -> bool:
     target_item = get_article_content_item(title)
     tag = find_element(
@@ -600,6 +1240,7 @@ def withdraw_and_into_editor(article: dict):
             driver.switch_to.window(handle)
 
 
+@traced("withdraw")
 def withdraw(title: str):
     driver.get(BJH_CONTENT_URL)
     target_item = get_article_content_item(title)
@@ -636,6 +1277,7 @@ def withdraw(title: str):
     click_element(By.XPATH, "//button[span[text()='确 定']]")
 
 
+@traced("into_modify")
 def into_modify(title: str):
     driver.get(BJH_CONTENT_URL)
     target_item = get_article_content_item(title)
@@ -647,73 +1289,323 @@ def into_modify(title: str):
             driver.switch_to.window(handle)
 
 
-current_temp_id = None
+class AccountLeases:
+    """向协调服务领取账号租约，多台机器同时运行时只为本节点持有租约的账号发布
+
+    后台线程定期续约，处理中的账号会随续约一同上报，协调服务不会将其收回
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__held: set[str] = set()
+        self.__busy: set[str] = set()
+        self.__expires = 0.0
+        self.__waiting = False
+        self.__stop_event = threading.Event()
+        self.__thread = threading.Thread(target=self.__heartbeat, daemon=True)
+        self.__store = None
+        if not COORDINATOR_URL:
+            from coordinator import LeaseStore
+
+            self.__store = LeaseStore(COORDINATOR_DB)
+
+    def __claim(self, usernames: list[str], busy: list[str]) -> dict:
+        if self.__store is not None:
+            return self.__store.claim(NODE_ID, usernames, busy, LEASE_TTL)
+        response = requests.post(
+            f"{COORDINATOR_URL}/claim",
+            json={
+                "node": NODE_ID,
+                "usernames": usernames,
+                "busy": busy,
+                "ttl": LEASE_TTL,
+            },
+            timeout=10,
+        ).json()
+        if response["code"] != 0:
+            raise Exception(response["msg"])
+        return response["data"]
+
+    def refresh(self):
+        usernames = [
+            cookie_file.name
+            for cookie_file in COOKIE_FOLDER.glob("*")
+            if cookie_file.suffix != ".expired"
+        ]
+        with self.__lock:
+            busy = list(self.__busy)
+        t = time.time()
+        result = self.__claim(usernames, busy)
+        held = set(result["held"])
+        with self.__lock:
+            if lost := self.__busy - held:
+                print(f"警告：处理中的账号租约已丢失，暂停处理：{'、'.join(lost)}")
+            if held != self.__held:
+                print(f"节点“{NODE_ID}”持有账号：{'、'.join(sorted(held)) or '无'}")
+            self.__held = held
+            self.__expires = t + LEASE_TTL
+            self.__waiting = result["waiting"]
+
+    def __heartbeat(self):
+        while not self.__stop_event.wait(LEASE_TTL / 3):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"账号租约续约失败：{e}")
+
+    def holds(self, username: str) -> bool:
+        with self.__lock:
+            return username in self.__held and time.time() < self.__expires
+
+    def waiting(self) -> bool:
+        """其他节点是否还持有应交还给本节点的账号"""
+        with self.__lock:
+            return self.__waiting
+
+    def acquire(self, username: str) -> bool:
+        """确认仍持有租约并标记为处理中"""
+        with self.__lock:
+            if username in self.__held and time.time() < self.__expires:
+                self.__busy.add(username)
+                return True
+            return False
+
+    def done(self, username: str):
+        with self.__lock:
+            self.__busy.discard(username)
+
+    def start(self):
+        self.refresh()
+        self.__thread.start()
+
+    def stop(self):
+        self.__stop_event.set()
+        self.__thread.join()
+        try:
+            if self.__store is not None:
+                self.__store.release(NODE_ID)
+            else:
+                requests.post(
+                    f"{COORDINATOR_URL}/release", json={"node": NODE_ID}, timeout=10
+                )
+        except Exception as e:
+            print(f"释放账号租约失败：{e}")
+
+
+account_leases: AccountLeases | None = None
+
+
+@contextmanager
+def lease_session():
+    global account_leases
+    if not (COORDINATOR_URL or COORDINATOR_DB):
+        yield
+        return
+    account_leases = AccountLeases()
+    account_leases.start()
+    try:
+        yield
+    finally:
+        account_leases.stop()
+        account_leases = None
+
+
+def lease_holds(username: str) -> bool:
+    return account_leases is None or account_leases.holds(username)
+
+
+def lease_waiting() -> bool:
+    return account_leases is not None and account_leases.waiting()
+
+
+def lease_acquire(username: str) -> bool:
+    return account_leases is None or account_leases.acquire(username)
+
+
+def lease_done(username: str):
+    if account_leases is not None:
+        account_leases.done(username)
+
+
+using_temps: dict[int, list[int]] = {}
 
 
 def set_using_temp(temp_id: int):
-    global current_temp_id
-    current_temp_id = temp_id
+    temp_ids = using_temps.setdefault(threading.get_ident(), [])
+    if temp_id not in temp_ids:
+        temp_ids.append(temp_id)
 
 
-def free_using_temp():
-    global current_temp_id
-    if current_temp_id:
-        requests.put(
-            f"{FRONTEND_URL}/api/tempArticle/tempArticleWithdrawn",
-            params={"article": current_temp_id},
+def release_temp(temp_id: int):
+    requests.put(
+        f"{FRONTEND_URL}/api/tempArticle/tempArticleWithdrawn",
+        params={"article": temp_id},
+    )
+
+
+def free_using_temp(temp_id: int | None = None):
+    """释放当前线程占用的临时文章，未指定时全部释放"""
+    temp_ids = using_temps.get(threading.get_ident(), [])
+    for using_temp_id in copy(temp_ids):
+        if temp_id is None or using_temp_id == temp_id:
+            temp_ids.remove(using_temp_id)
+            release_temp(using_temp_id)
+
+
+def free_all_using_temps():
+    for thread_id in list(using_temps):
+        for temp_id in using_temps.pop(thread_id, []):
+            release_temp(temp_id)
+
+
+review_history = ReviewHistory(REVIEW_HISTORY_FILE, REVIEW_MAX_INTERVAL)
+
+
+class PostJob:
+    """单篇文章的发布流程
+
+    流程被拆分为若干阶段，每次调用step只推进一个阶段，等待审核的阶段只检查一次状态，
+    以便同一浏览器在等待审核期间登录其他账号继续发布
+    """
+
+    PUBLISH_TEMP = "发布临时文章"
+    AWAIT_TEMP_REVIEW = "等待临时文章审核"
+    WITHDRAW = "撤回"
+    MODIFY = "修改"
+    AWAIT_FINAL_REVIEW = "等待最终审核"
+    DONE = "已完成"
+
+    def __init__(self, username: str, article: dict, temp: dict):
+        self.username = username
+        self.article = article
+        self.temp = temp
+        self.stage = PostJob.PUBLISH_TEMP
+        self.next_check = 0.0
+        self.review_started = 0.0
+        self.last_check = 0.0
+        self.paused_since: float | None = None
+
+    def is_due(self) -> bool:
+        return time.time() >= self.next_check
+
+    def is_reviewing(self) -> bool:
+        return self.stage in (PostJob.AWAIT_TEMP_REVIEW, PostJob.AWAIT_FINAL_REVIEW)
+
+    def lease_held(self) -> bool:
+        """每个阶段开始前确认仍持有账号租约，丢失时暂停，长时间未恢复则放弃"""
+        if self.stage == PostJob.AWAIT_FINAL_REVIEW or lease_holds(self.username):
+            self.paused_since = None
+            return True
+        now = time.time()
+        if self.paused_since is None:
+            self.paused_since = now
+            print(
+                f"账号“{self.username}”租约已丢失，暂停《{self.article['title']}》的发布"
+            )
+        if now - self.paused_since >= LEASE_TTL * 3:
+            raise LeaseLostException(f"账号“{self.username}”租约丢失后未能恢复")
+        self.next_check = now + LEASE_TTL / 3
+        return False
+
+    def step(self):
+        if not self.lease_held():
+            return
+        match self.stage:
+            case PostJob.PUBLISH_TEMP:
+                self.publish_temp()
+            case PostJob.AWAIT_TEMP_REVIEW:
+                self.check_review(self.temp["title"], PostJob.WITHDRAW)
+            case PostJob.WITHDRAW:
+                self.withdraw()
+            case PostJob.MODIFY:
+                self.modify()
+            case PostJob.AWAIT_FINAL_REVIEW:
+                self.check_review(self.article["title"], PostJob.DONE)
+
+    def review_kind(self) -> tuple[str, str, float]:
+        """当前审核阶段对应的记录类型、显示名称与基础检查间隔"""
+        if self.stage == PostJob.AWAIT_TEMP_REVIEW:
+            return "temp", "临时文章", TEMP_REVIEW_INTERVAL
+        return "final", "最终", FINAL_REVIEW_INTERVAL
+
+    def wait_review(self, stage: str, interval: float):
+        self.stage = stage
+        self.review_started = self.last_check = time.time()
+        kind, _, base = self.review_kind()
+        delay = review_history.next_delay(self.username, kind, 0, base)
+        self.next_check = self.review_started + (interval if delay is None else delay)
+
+    def check_review(self, title: str, next_stage: str):
+        kind, label, base = self.review_kind()
+        # 调度器忙于其他任务时检查会晚于计划时间，此时通过时间无法准确估计
+        late = time.time() - self.next_check > self.next_check - self.last_check
+        with trace_stage("load_content"):
+            driver.get(BJH_CONTENT_URL)
+        approved = check_article_status(title)
+        now = time.time()
+        run_stats.add(f"{label}审核检查次数", username=self.username)
+        if approved:
+            if not late:
+                # 实际通过时间位于上次检查与本次检查之间
+                latency = (self.last_check + now) / 2 - self.review_started
+                review_history.record(self.username, kind, latency)
+            run_stats.add(f"{label}审核通过数", username=self.username)
+            run_stats.add(
+                f"{label}审核检测延迟上限(秒)",
+                now - self.last_check,
+                username=self.username,
+            )
+            print(f"《{title}》已通过审核")
+            self.stage = next_stage
+            self.next_check = 0.0
+            return
+        if now - self.review_started >= REVIEW_TIMEOUT:
+            raise ReviewTimeoutException(f"《{title}》审核超过{REVIEW_TIMEOUT}秒")
+        self.last_check = now
+        delay = review_history.next_delay(
+            self.username, kind, now - self.review_started, base
         )
-        current_temp_id = None
+        self.next_check = now + (base if delay is None else delay)
 
+    def publish_temp(self):
+        temp = self.temp
+        print(f"正在发布临时文章：《{temp['title']}》...")
 
-def single_post_workflow(username, article, temp):
-    print(f"正在发布临时文章：《{temp['title']}》...")
-    while True:
-        driver.get(BJH_NEW_EDIT_URL)
-        try:
+        def publish():
+            with trace_stage("load_editor"):
+                driver.get(BJH_NEW_EDIT_URL)
             post_article(
                 temp["path"],
                 temp["title"],
                 temp["covers"],
                 temp["mainCover"],
             )
+
+        try:
+            RETRY_POLICIES[self.stage].run(self.stage, publish)
         except PostLimitedException as e:
-            free_using_temp()
+            free_using_temp(temp["ID"])
             raise e
-        except Exception as e:
-            print(f"发布失败:{e}")
-            print("正在重试...")
-        else:
-            break
 
-    print(f"临时文章《{temp['title']}》发布成功")
+        print(f"临时文章《{temp['title']}》发布成功，等待审核...")
+        self.wait_review(PostJob.AWAIT_TEMP_REVIEW, 0)
 
-    driver.get(BJH_CONTENT_URL)
-    print(f"等待审核...", end="")
-    while not check_article_status(temp["title"]):
-        print(".", end="")
-        time.sleep(5)
-        driver.get(BJH_CONTENT_URL)
-    print(f"\n已通过审核")
+    def withdraw(self):
+        # withdraw_and_into_editor(temp)
+        RETRY_POLICIES[self.stage].run(self.stage, lambda: withdraw(self.temp["title"]))
+        print(f"《{self.temp['title']}》已撤回")
+        requests.put(
+            f"{FRONTEND_URL}/api/tempArticle/tempArticleWithdrawn",
+            params={"article": self.article["ID"]},
+        )
+        self.stage = PostJob.MODIFY
 
-    # withdraw_and_into_editor(temp)
-    while True:
-        try:
-            withdraw(temp["title"])
-        except Exception as e:
-            print(f"撤回失败：{e}")
-            print(f"正在重试...")
-        else:
-            break
-    print(f"《{temp['title']}》已撤回")
-    requests.put(
-        f"{FRONTEND_URL}/api/tempArticle/tempArticleWithdrawn",
-        params={"article": article["ID"]},
-    )
+    def modify(self):
+        article = self.article
+        print("开始修改...")
 
-    print("开始修改...")
-    while True:
-        try:
-            into_modify(temp["title"])
+        def modify():
+            into_modify(self.temp["title"])
 
             clean_editor()
             print("已清空")
@@ -725,127 +1617,512 @@ def single_post_workflow(username, article, temp):
                 article["mainCover"],
                 is_modifying=True,
             )
-        except Exception:
-            print("修改文章失败，正在重试...")
-        else:
-            break
-    free_using_temp()
-    print(f"成功修改至《{article['title']}》")
 
+        RETRY_POLICIES[self.stage].run(self.stage, modify)
+        count_published_article()
+        free_using_temp(self.temp["ID"])
+        print(f"成功修改至《{article['title']}》")
+        requests.put(
+            f"{FRONTEND_URL}/api/articleInfo/articleUsed",
+            params={"article": article["ID"], "id": self.username},
+        )
+        self.wait_review(PostJob.AWAIT_FINAL_REVIEW, FINAL_REVIEW_INTERVAL)
+
+
+def single_post_workflow(username, article, temp):
+    job = PostJob(username, article, temp)
+    while job.stage != PostJob.AWAIT_FINAL_REVIEW:
+        time.sleep(max(0, job.next_check - time.time()))
+        try:
+            job.step()
+        except DriverCrashedException as e:
+            recover_driver(e)
     return True
 
 
-def main_workflow():
-    check_list: dict[str, list[str]] = {}
-    fail_list: dict[str, Any] = {}
-    finished_usernames = []
+def prepare_job(username: str, article: dict, temp: dict) -> PostJob:
+    set_using_temp(temp["ID"])
 
-    while True:
-        finished = True
-        for cookie_file in filter(
-            lambda p: p.suffix != ".expired", COOKIE_FOLDER.glob("*")
-        ):
+    save_docx(article)
+    save_docx(temp)
+    print(f"已获取文章《{article['title']}》与临时文章《{temp['title']}》")
+    return PostJob(username, article, temp)
+
+
+def publish_account_article(
+    username: str,
+    article: dict,
+    temp: dict,
+    check_list: dict[str, list[str]],
+    fail_list: dict[str, Any],
+) -> bool:
+    """发布单篇文章，返回该账号今日是否还能继续发布"""
+    prepare_job(username, article, temp)
+
+    try:
+        single_post_workflow(username, article, temp)
+    except DriverCrashedException:
+        raise
+    except Exception as e:
+        handle_job_failure(username, article, e, fail_list)
+        # 熔断由account_breaker自行恢复，租约丢失后轮询线程会重新领取该账号，
+        # 只有平台限制才需要等到第二天
+        return not isinstance(e, (PostLimitedException, PostBannedException))
+    else:
+        account_breaker.record_success(username)
+        check_list.setdefault(username, []).append(article["title"])
+        return True
+
+
+def handle_job_failure(
+    username: str, article: dict, e: Exception, fail_list: dict[str, Any]
+) -> bool:
+    """记录发布失败，返回该账号是否还能继续发布"""
+    if isinstance(e, LeaseLostException):
+        print(e)
+        fail_list.setdefault(username, []).append((article["title"], str(e)))
+        return False
+    if isinstance(e, PostLimitedException):
+        print(f"账号今日发布数达到上限，提示：{e}")
+        fail_list.setdefault(username, []).append(str(e))
+        return False
+    if isinstance(e, PostBannedException):
+        print(f"账号修改文章被限制，提示：{e}")
+        fail_list.setdefault(username, []).append((article["title"], str(e)))
+        return False
+    print(f"发布失败：{e}")
+    fail_list.setdefault(username, []).append((article["title"], str(e)))
+    account_breaker.record_failure(username)
+    return not account_breaker.is_given_up(username)
+
+
+def check_account_reviews(
+    username: str, to_checks: list[str], fail_list: dict[str, Any]
+):
+    ensure_login(username)
+    print(f"查看“{username}”...")
+    with trace_stage("load_content"):
+        driver.get(BJH_CONTENT_URL)
+    for reviewing_article in copy(to_checks):
+        try:
+            approved = check_article_status(reviewing_article)
+        except DriverCrashedException:
+            raise
+        except Exception as e:
+            # 审核未通过等异常状态不会再变化，不再重复检查
+            print(f"《{reviewing_article}》发布失败：{e}")
+            fail_list.setdefault(username, []).append((reviewing_article, str(e)))
+            to_checks.remove(reviewing_article)
+            continue
+        if approved:
+            to_checks.remove(reviewing_article)
+
+
+def expire_cookie(cookie_file: Path, fail_list: dict[str, Any]):
+    username = cookie_file.name
+    print(f"账号“{username}”cookie已过期")
+    fail_list.setdefault(username, []).append("cookie已过期")
+    cookie_file.rename(cookie_file.with_name(f"{username}.expired"))
+
+
+def ensure_login(username: str):
+    if current_username() != username:
+        recycle_driver_if_needed()
+        login(COOKIE_FOLDER / username)
+        print(f"\n\n已登录账号“{username}”\n\n")
+
+
+class PostScheduler:
+    """在同一浏览器中交替处理多个账号的发布流程
+
+    某账号的文章等待审核时，先去其他账号发布；到期的审核检查优先于开始新账号，
+    以便审核通过后尽快回来继续
+    """
+
+    def __init__(self):
+        self.jobs: list[PostJob] = []
+        self.fail_list: dict[str, Any] = {}
+        self.finished_usernames: list[str] = []
+
+    def has_active_job(self, username: str) -> bool:
+        return any(
+            job.username == username and job.stage != PostJob.AWAIT_FINAL_REVIEW
+            for job in self.jobs
+        )
+
+    def pending_accounts(self) -> list[Path]:
+        return [
+            cookie_file
+            for cookie_file in COOKIE_FOLDER.glob("*")
+            if cookie_file.suffix != ".expired"
+            and cookie_file.name not in self.finished_usernames
+            and not self.has_active_job(cookie_file.name)
+            and lease_holds(cookie_file.name)
+        ]
+
+    def next_job(self) -> PostJob | None:
+        """按优先级选出下一个要推进的流程：
+        非等待阶段 > 当前账号的到期审核 > 其他账号中最早到期的临时文章审核 > 新账号
+        > 其他账号中最早到期的最终审核
+
+        最终审核通过后无需再做任何操作，不值得为其频繁切换账号而推迟新账号的发布
+        """
+        due_jobs = [job for job in self.jobs if job.is_due()]
+        for job in due_jobs:
+            if not job.is_reviewing():
+                return job
+        for job in due_jobs:
+            if job.username == current_username():
+                return job
+        if temp_reviews := [
+            job for job in due_jobs if job.stage == PostJob.AWAIT_TEMP_REVIEW
+        ]:
+            return min(temp_reviews, key=lambda job: job.next_check)
+        if job := self.start_job():
+            return job
+        if len(due_jobs):
+            return min(due_jobs, key=lambda job: job.next_check)
+        return None
+
+    def start_job(self) -> PostJob | None:
+        for cookie_file in self.pending_accounts():
             username = cookie_file.name
-            if username in finished_usernames:
+            if not account_breaker.allow(username) or not lease_acquire(username):
                 continue
 
             try:
-                login(cookie_file)
+                ensure_login(username)
+                (article, temp) = get_article(username)
             except CookieExpiredException:
-                print(f"账号“{username}”cookie已过期")
-                fail_list.setdefault(username, []).append("cookie已过期")
-                finished_usernames.append(username)
-                cookie_file.rename(cookie_file.with_name(f"{username}.expired"))
+                lease_done(username)
+                expire_cookie(cookie_file, self.fail_list)
+                self.finished_usernames.append(username)
                 continue
-
-            print(f"\n\n已登录账号“{username}”\n\n")
-
-            (article, temp) = get_article(username)
+            except BaseException:
+                lease_done(username)
+                raise
 
             if not (article and temp):
                 print("无可发布文章")
-                finished_usernames.append(username)
+                lease_done(username)
+                self.finished_usernames.append(username)
                 continue
 
-            finished = False
+            job = prepare_job(username, article, temp)
+            self.jobs.append(job)
+            return job
+        return None
 
-            set_using_temp(temp["ID"])
+    def advance(self, job: PostJob):
+        try:
+            ensure_login(job.username)
+        except CookieExpiredException:
+            lease_done(job.username)
+            expire_cookie(COOKIE_FOLDER / job.username, self.fail_list)
+            self.finished_usernames.append(job.username)
+            for expired_job in [j for j in self.jobs if j.username == job.username]:
+                self.jobs.remove(expired_job)
+            return
 
-            save_docx(article)
-            save_docx(temp)
-            print(f"已获取文章《{article['title']}》与临时文章《{temp['title']}》")
+        stage = job.stage
+        try:
+            job.step()
+        except DriverCrashedException:
+            raise
+        except Exception as e:
+            self.jobs.remove(job)
+            if stage != PostJob.AWAIT_FINAL_REVIEW:
+                lease_done(job.username)
+            if stage == PostJob.AWAIT_FINAL_REVIEW:
+                print(f"《{job.article['title']}》发布失败：{e}")
+                self.fail_list.setdefault(job.username, []).append(
+                    (job.article["title"], str(e))
+                )
+            elif not handle_job_failure(job.username, job.article, e, self.fail_list):
+                self.finished_usernames.append(job.username)
+            return
 
+        if stage == PostJob.MODIFY and job.stage != PostJob.MODIFY:
+            lease_done(job.username)
+            account_breaker.record_success(job.username)
+        elif job.stage == PostJob.DONE:
+            self.jobs.remove(job)
+
+    def wait(self):
+        if len(self.jobs):
+            wait_time = min(job.next_check for job in self.jobs) - time.time()
+        elif wait_time := account_breaker.wait_time():
+            print(f"所有待发布账号均已熔断，{wait_time:.0f}秒后重试...")
+        else:
+            wait_time = LEASE_TTL / 3
+            print(f"等待其他节点交还账号，{wait_time:.0f}秒后重试...")
+        time.sleep(max(0, wait_time))
+
+    def run(self):
+        while True:
             try:
-                single_post_workflow(username, article, temp)
-            except PostLimitedException as e:
-                print(f"账号今日发布数达到上限，提示：{e}")
-                fail_list.setdefault(username, []).append(str(e))
-                finished_usernames.append(username)
+                if job := self.next_job():
+                    self.advance(job)
+                    continue
+            except DriverCrashedException as e:
+                recover_driver(e)
                 continue
+            if (
+                len(self.jobs)
+                or lease_waiting()
+                or any(
+                    not account_breaker.is_given_up(cookie_file.name)
+                    for cookie_file in self.pending_accounts()
+                )
+            ):
+                self.wait()
+            else:
+                break
+
+
+def main_workflow():
+    scheduler = PostScheduler()
+    with lease_session():
+        scheduler.run()
+
+    print(f"任务结束")
+    print(scheduler.fail_list)
+    run_stats.report()
+
+
+class DaemonState:
+    """守护模式下轮询线程与工作线程共享的状态"""
+
+    def __init__(self, workers: int):
+        self.stop_event = threading.Event()
+        self.tasks: queue.Queue[tuple[str, str, Any] | None] = queue.Queue()
+        # 工作线程全忙时阻塞轮询，避免提前占用临时文章
+        self.slots = threading.Semaphore(workers)
+        self.alive_workers = workers
+        self.lock = threading.Lock()
+        self.busy_usernames: set[str] = set()
+        self.limited_usernames: dict[str, date] = {}
+        self.check_list: dict[str, list[str]] = {}
+        self.fail_list: dict[str, Any] = {}
+
+    def claim(self, username: str) -> bool:
+        """占用一个空闲工作线程，停止时返回False"""
+        while not self.stop_event.is_set():
+            if self.slots.acquire(timeout=1):
+                with self.lock:
+                    self.busy_usernames.add(username)
+                return True
+        return False
+
+    def release(self, username: str):
+        with self.lock:
+            self.busy_usernames.discard(username)
+        lease_done(username)
+        self.slots.release()
+
+    def retire_worker(self):
+        """工作线程因浏览器无法恢复而退出时，收回其并发名额以免轮询继续领取文章"""
+        with self.lock:
+            self.alive_workers -= 1
+            alive_workers = self.alive_workers
+        if alive_workers <= 0:
+            print("所有工作线程均已退出，守护模式停止")
+            self.stop_event.set()
+            return
+        while not self.stop_event.is_set():
+            if self.slots.acquire(timeout=1):
+                return
+
+    def is_available(self, username: str) -> bool:
+        with self.lock:
+            if username in self.busy_usernames:
+                return False
+            limited_date = self.limited_usernames.get(username)
+            if limited_date == date.today():
+                return False
+        return account_breaker.allow(username) and not account_breaker.is_given_up(
+            username
+        )
+
+
+def daemon_worker(state: DaemonState):
+    try:
+        with create_driver(headless=not SHOW_WINDOW):
+            while (task := state.tasks.get()) is not None:
+                kind, username, payload = task
+                try:
+                    if kind == "publish":
+                        article, temp = payload
+                        cookie_file = COOKIE_FOLDER / username
+                        # 任务中途失败时由finally中的free_using_temp释放
+                        set_using_temp(temp["ID"])
+                        recycle_driver_if_needed()
+                        try:
+                            login(cookie_file)
+                        except CookieExpiredException:
+                            with state.lock:
+                                expire_cookie(cookie_file, state.fail_list)
+                            continue
+                        print(f"\n\n已登录账号“{username}”\n\n")
+                        if not publish_account_article(
+                            username, article, temp, state.check_list, state.fail_list
+                        ):
+                            with state.lock:
+                                state.limited_usernames[username] = date.today()
+                        # 已登录该账号，顺带检查之前发布的文章
+                        if to_checks := state.check_list.get(username):
+                            check_account_reviews(username, to_checks, state.fail_list)
+                    elif kind == "review":
+                        check_account_reviews(username, payload, state.fail_list)
+                except DriverCrashedException as e:
+                    print(f"账号“{username}”任务中断：{e}")
+                    recover_driver(e)
+                except Exception as e:
+                    print(f"账号“{username}”任务失败：{e}")
+                finally:
+                    free_using_temp()
+                    state.release(username)
+    except Exception as e:
+        print(f"工作线程异常退出：{e}")
+        state.retire_worker()
+
+
+def daemon_poll(state: DaemonState):
+    interval = DAEMON_POLL_INTERVAL
+    while not state.stop_event.is_set():
+        found = False
+        for cookie_file in filter(
+            lambda p: p.suffix != ".expired", COOKIE_FOLDER.glob("*")
+        ):
+            username = cookie_file.name
+            if not state.is_available(username) or not lease_acquire(username):
+                continue
+            if not state.claim(username):
+                lease_done(username)
+                return
+            with state.lock:
+                to_checks = state.check_list.get(username)
+                if to_checks is not None and not len(to_checks):
+                    del state.check_list[username]
+                    to_checks = None
+            try:
+                (article, temp) = get_article(username)
             except Exception as e:
-                print(f"发布失败：{e}")
-                fail_list.setdefault(username, []).append((article["title"], str(e)))
+                print(f"获取账号“{username}”的文章失败：{e}")
+                article = temp = None
+            if article and temp:
+                # 发布任务完成后会一并检查待审核文章
+                found = True
+                state.tasks.put(("publish", username, (article, temp)))
                 continue
+            if temp:
+                release_temp(temp["ID"])
+            if to_checks:
+                state.tasks.put(("review", username, to_checks))
             else:
-                requests.put(
-                    f"{FRONTEND_URL}/api/articleInfo/articleUsed",
-                    params={"article": article["ID"], "id": username},
-                )
-                check_list.setdefault(username, []).append(article["title"])
-        if finished:
-            break
+                state.release(username)
 
-    print("等待已发布文章审核...")
-    while len(check_list):
-        for username, to_checks in copy(check_list).items():
-            if len(to_checks):
-                login(COOKIE_FOLDER / username)
-                print(f"查看“{username}”...")
-                driver.get(BJH_CONTENT_URL)
-                for reviewing_article in copy(to_checks):
-                    status = check_article_status(reviewing_article)
-                    if status is True:
-                        to_checks.remove(reviewing_article)
-                    elif isinstance(status, str):
-                        print(f"《{reviewing_article}》发布失败，当前状态：{status}")
-                        fail_list.setdefault(username, []).append(
-                            (reviewing_article, status)
-                        )
-                time.sleep(3)
-            else:
-                del check_list[username]
+        if found:
+            interval = DAEMON_POLL_INTERVAL
+        else:
+            state.stop_event.wait(interval)
+            interval = min(interval * 2, DAEMON_MAX_POLL_INTERVAL)
 
-    print(f"任务结束")
-    print(fail_list)
 
+def daemon_workflow(workers: int = 1):
+    state = DaemonState(workers)
 
-try:
-    while True:
-        choices = ["发布文章", "添加账号", "退出"]
-        expired_usernames = [
-            file.name.rsplit(".", 1)[0] for file in COOKIE_FOLDER.glob("*.expired")
+    def handle_stop_signal(signum, frame):
+        if state.stop_event.is_set():
+            raise KeyboardInterrupt()
+        print("收到停止信号，等待进行中的任务结束（再次发送将强制退出）...")
+        state.stop_event.set()
+
+    signal.signal(signal.SIGINT, handle_stop_signal)
+    signal.signal(signal.SIGTERM, handle_stop_signal)
+
+    with lease_session():
+        threads = [
+            threading.Thread(target=daemon_worker, args=(state,), daemon=True)
+            for _ in range(workers)
         ]
-        if len(expired_usernames):
-            choices.insert(1, "更新cookie")
-
-        match inquirer.list_input("选择任务", choices=choices):
-            case "发布文章":
-                with create_driver(headless=not SHOW_WINDOW):
-                    main_workflow()
-            case "更新cookie":
-                username = inquirer.list_input("选择账号", choices=expired_usernames)
-                with create_driver(headless=False):
-                    get_cookies(username)
-                if (COOKIE_FOLDER / username).exists():
-                    os.remove(COOKIE_FOLDER / f"{username}.expired")
-            case "添加账号":
-                username = input("请输入账号：")
-                with create_driver(headless=False):
-                    get_cookies(username)
-            case "退出":
+        for thread in threads:
+            thread.start()
+
+        print(f"守护模式已启动，工作线程数：{workers}")
+        daemon_poll(state)
+
+        # 释放尚未开始处理的任务所占用的临时文章
+        while True:
+            try:
+                task = state.tasks.get_nowait()
+            except queue.Empty:
                 break
+            if task is not None and task[0] == "publish":
+                release_temp(task[2][1]["ID"])
+        for _ in threads:
+            state.tasks.put(None)
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=1)
+
+    print(f"守护模式已停止")
+    print(state.fail_list)
+    run_stats.report()
+
+
+def take_driver(prewarmer: DriverPrewarmer | None, headless: bool):
+    if prewarmer is not None:
+        try:
+            return prewarmer.take()
+        except Exception as e:
+            print(f"预启动浏览器失败：{e}")
+    return create_driver(headless=headless)
+
+
+mark_startup("模块加载完成")
+prewarmer: DriverPrewarmer | None = None
+try:
+    if cli_args.daemon:
+        daemon_workflow(DAEMON_WORKERS)
+    else:
+        while True:
+            choices = ["发布文章", "添加账号", "退出"]
+            expired_usernames = [
+                file.name.rsplit(".", 1)[0] for file in COOKIE_FOLDER.glob("*.expired")
+            ]
+            if len(expired_usernames):
+                choices.insert(1, "更新cookie")
+
+            if PREWARM_DRIVER and prewarmer is None:
+                prewarmer = DriverPrewarmer(headless=not SHOW_WINDOW)
+
+            mark_startup("菜单就绪")
+            match inquirer.list_input("选择任务", choices=choices):
+                case "发布文章":
+                    with take_driver(prewarmer, headless=not SHOW_WINDOW):
+                        prewarmer = None
+                        mark_startup("浏览器就绪")
+                        main_workflow()
+                case "更新cookie":
+                    username = inquirer.list_input(
+                        "选择账号", choices=expired_usernames
+                    )
+                    with create_driver(headless=False):
+                        get_cookies(username)
+                    if (COOKIE_FOLDER / username).exists():
+                        os.remove(COOKIE_FOLDER / f"{username}.expired")
+                case "添加账号":
+                    username = input("请输入账号：")
+                    with create_driver(headless=False):
+                        get_cookies(username)
+                case "退出":
+                    break
 
 except Exception as e:
     print(f"发生错误，任务终止：{e}")
 finally:
-    free_using_temp()
+    free_all_using_temps()
+    if prewarmer is not None:
+        prewarmer.discard()
+    report_startup()
@@ -0,0 +1,228 @@
+import json
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+
+class RetryExhaustedException(Exception):
+    pass
+
+
+class RunStats:
+    """按账号记录一次运行中的重试次数等计数，随任务结果一同输出"""
+
+    def __init__(self, default_username: Callable[[], str | None] = lambda: None):
+        self.__default_username = default_username
+        self.__lock = threading.Lock()
+        self.__counters: dict[str, dict[str, float]] = {}
+
+    def add(self, name: str, value: float = 1, username: str | None = None):
+        username = username or self.__default_username() or "-"
+        with self.__lock:
+            counter = self.__counters.setdefault(name, {})
+            counter[username] = counter.get(username, 0) + value
+
+    def get(self, name: str, username: str) -> float:
+        with self.__lock:
+            return self.__counters.get(name, {}).get(username, 0)
+
+    def report(self):
+        with self.__lock:
+            if not self.__counters:
+                return
+            print("运行统计：")
+            for name, counter in self.__counters.items():
+                print(f"  {name}：")
+                for username, value in counter.items():
+                    print(f"    {username}：{round(value, 3)}")
+
+
+class RetryPolicy:
+    """有上限的重试策略，失败间隔按指数退避并加入随机抖动
+
+    check在每次失败后调用，可抛出异常以跳过剩余的重试（如浏览器已失效）
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 5,
+        base_delay: float = 2,
+        max_delay: float = 60,
+        fatal: tuple[type[Exception], ...] = (),
+        check: Callable[[Exception], None] | None = None,
+        stats: RunStats | None = None,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.fatal = fatal
+        self.check = check
+        self.stats = stats
+
+    def delay(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return random.uniform(delay / 2, delay)
+
+    def run(self, stage: str, func: Callable[[], Any]):
+        attempt = 1
+        while True:
+            try:
+                return func()
+            except self.fatal:
+                raise
+            except Exception as e:
+                if self.check:
+                    self.check(e)
+                if attempt >= self.max_attempts:
+                    raise RetryExhaustedException(
+                        f"{stage}已重试{attempt - 1}次仍失败：{e}"
+                    ) from e
+                delay = self.delay(attempt)
+                print(f"{stage}失败：{e}")
+                print(f"{delay:.1f}秒后重试（{attempt}/{self.max_attempts}）...")
+                if self.stats:
+                    self.stats.add(f"{stage}重试")
+                time.sleep(delay)
+                attempt += 1
+
+
+class CircuitBreaker:
+    """账号连续失败过多时暂时跳过该账号，冷却后再尝试
+
+    熔断次数达到上限后放弃该账号，距最后一次熔断超过reset秒后清零重新尝试
+    """
+
+    def __init__(
+        self,
+        threshold: int = 3,
+        cooldown: float = 1800,
+        max_trips: int = 3,
+        reset: float = 86400,
+        stats: RunStats | None = None,
+    ):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_trips = max_trips
+        self.reset = reset
+        self.stats = stats
+        self.__lock = threading.Lock()
+        self.__failures: dict[str, int] = {}
+        self.__opened_at: dict[str, float] = {}
+        self.__trips: dict[str, int] = {}
+
+    def __expire(self, now: float):
+        for username, opened_at in list(self.__opened_at.items()):
+            if now - opened_at >= self.reset:
+                self.__opened_at.pop(username)
+                self.__trips.pop(username, None)
+
+    def __given_up(self, username: str) -> bool:
+        return self.__trips.get(username, 0) >= self.max_trips
+
+    def allow(self, username: str) -> bool:
+        with self.__lock:
+            self.__expire(time.time())
+            opened_at = self.__opened_at.get(username)
+            return opened_at is None or time.time() - opened_at >= self.cooldown
+
+    def is_given_up(self, username: str) -> bool:
+        with self.__lock:
+            self.__expire(time.time())
+            return self.__given_up(username)
+
+    def wait_time(self) -> float:
+        """距离最早一个熔断账号恢复尝试的秒数，没有冷却中的账号时返回0"""
+        with self.__lock:
+            now = time.time()
+            self.__expire(now)
+            return min(
+                (
+                    t + self.cooldown - now
+                    for username, t in self.__opened_at.items()
+                    if t + self.cooldown > now and not self.__given_up(username)
+                ),
+                default=0,
+            )
+
+    def record_success(self, username: str):
+        with self.__lock:
+            self.__failures.pop(username, None)
+            self.__opened_at.pop(username, None)
+            self.__trips.pop(username, None)
+
+    def record_failure(self, username: str):
+        with self.__lock:
+            self.__failures[username] = self.__failures.get(username, 0) + 1
+            if self.__failures[username] < self.threshold:
+                return
+            self.__failures[username] = 0
+            self.__opened_at[username] = time.time()
+            self.__trips[username] = self.__trips.get(username, 0) + 1
+            trips = self.__trips[username]
+        if self.stats:
+            self.stats.add("熔断次数", username=username)
+        if trips >= self.max_trips:
+            print(f"账号“{username}”多次熔断，{self.reset}秒内不再尝试")
+        else:
+            print(f"账号“{username}”连续失败，暂停{self.cooldown}秒后再试")
+
+
+class ReviewHistory:
+    """按账号记录文章从发布到通过审核的耗时，并据此安排审核状态的检查时间
+
+    预计通过之前稀疏检查，在历史耗时的10%~90%分位之间按基础间隔密集检查，
+    超过90%分位后逐渐放慢；样本不足时沿用固定间隔
+    """
+
+    MAX_SAMPLES = 50
+    MIN_SAMPLES = 3
+
+    def __init__(self, path: Path, max_interval: float = 120):
+        self.__path = path
+        self.max_interval = max_interval
+        self.__lock = threading.Lock()
+        self.__history: dict[str, dict[str, list[float]]] = {}
+        if path.exists():
+            try:
+                self.__history = json.load(path.open("r", encoding="utf-8"))
+            except Exception as e:
+                print(f"审核耗时记录读取失败：{e}")
+
+    def record(self, username: str, kind: str, latency: float):
+        with self.__lock:
+            samples = self.__history.setdefault(username, {}).setdefault(kind, [])
+            samples.append(round(latency, 1))
+            del samples[: -self.MAX_SAMPLES]
+            with self.__path.open("w", encoding="utf-8") as f:
+                json.dump(self.__history, f, ensure_ascii=False)
+
+    def samples(self, username: str, kind: str) -> list[float]:
+        """优先使用该账号的记录，不足时使用所有账号的记录"""
+        with self.__lock:
+            samples = self.__history.get(username, {}).get(kind, [])
+            if len(samples) < self.MIN_SAMPLES:
+                samples = [
+                    latency
+                    for account in self.__history.values()
+                    for latency in account.get(kind, [])
+                ]
+            return sorted(samples)
+
+    def next_delay(
+        self, username: str, kind: str, elapsed: float, base: float
+    ) -> float | None:
+        """返回距下次检查的秒数，历史记录不足时返回None"""
+        samples = self.samples(username, kind)
+        if len(samples) < self.MIN_SAMPLES:
+            return None
+        low = samples[int(0.1 * (len(samples) - 1))]
+        high = samples[int(0.9 * (len(samples) - 1))]
+        if elapsed < low:
+            delay = low - elapsed
+        elif elapsed <= high:
+            delay = base
+        else:
+            delay = (elapsed - high) / 2
+        return min(self.max_interval, max(base, delay))
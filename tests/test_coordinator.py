@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+from coordinator import LeaseStore
+
+USERNAMES = ["a", "b", "c", "d"]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LeaseStore(tmp_path / "leases.db")
+
+
+def test_single_node_claims_all(store):
+    result = store.claim("n1", USERNAMES, [], 60)
+    assert sorted(result["held"]) == USERNAMES
+    assert not result["waiting"]
+
+
+def test_accounts_held_by_one_node_only(store):
+    first = store.claim("n1", USERNAMES, [], 60)["held"]
+    second = store.claim("n2", USERNAMES, [], 60)["held"]
+    assert not set(first) & set(second)
+
+
+def test_expired_leases_are_reclaimed(store):
+    store.claim("n1", USERNAMES, [], 0.2)
+    time.sleep(0.3)
+    result = store.claim("n2", USERNAMES, [], 0.2)
+    assert sorted(result["held"]) == USERNAMES
+
+
+def test_new_node_waits_for_rebalancing(store):
+    store.claim("n1", USERNAMES, [], 60)
+    result = store.claim("n2", USERNAMES, [], 60)
+    assert result["held"] == []
+    assert result["waiting"]
+
+    assert len(store.claim("n1", USERNAMES, [], 60)["held"]) == 2
+    result = store.claim("n2", USERNAMES, [], 60)
+    assert sorted(result["held"]) == sorted(
+        set(USERNAMES) - set(store.claim("n1", USERNAMES, [], 60)["held"])
+    )
+    assert not result["waiting"]
+
+
+def test_busy_accounts_are_kept(store):
+    store.claim("n1", USERNAMES, [], 60)
+    store.claim("n2", USERNAMES, [], 60)
+    held = store.claim("n1", USERNAMES, ["a", "b", "c"], 60)["held"]
+    assert sorted(held) == ["a", "b", "c"]
+    assert store.claim("n2", USERNAMES, [], 60)["held"] == ["d"]
+
+
+def test_release_frees_accounts(store):
+    store.claim("n1", USERNAMES, [], 60)
+    store.claim("n2", USERNAMES, [], 60)
+    store.release("n1")
+    assert sorted(store.claim("n2", USERNAMES, [], 60)["held"]) == USERNAMES
@@ -0,0 +1,162 @@
+import time
+
+import pytest
+
+from policies import (
+    CircuitBreaker,
+    RetryExhaustedException,
+    RetryPolicy,
+    ReviewHistory,
+    RunStats,
+)
+
+
+class FatalError(Exception):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+
+
+def failing(errors: list[Exception]):
+    calls = []
+
+    def func():
+        calls.append(None)
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    return func, calls
+
+
+@pytest.mark.parametrize("attempt", range(1, 10))
+def test_retry_delay_within_bounds(attempt):
+    policy = RetryPolicy(base_delay=2, max_delay=60)
+    expected = min(60, 2 * 2 ** (attempt - 1))
+    for _ in range(20):
+        assert expected / 2 <= policy.delay(attempt) <= expected
+
+
+def test_retry_succeeds_after_failures():
+    stats = RunStats()
+    func, calls = failing([ValueError("a"), ValueError("b")])
+    assert RetryPolicy(max_attempts=3, stats=stats).run("stage", func) == "ok"
+    assert len(calls) == 3
+    assert stats.get("stage重试", "-") == 2
+
+
+def test_retry_exhausted():
+    func, calls = failing([ValueError()] * 5)
+    with pytest.raises(RetryExhaustedException):
+        RetryPolicy(max_attempts=3).run("stage", func)
+    assert len(calls) == 3
+
+
+def test_fatal_exception_not_retried():
+    func, calls = failing([FatalError()])
+    with pytest.raises(FatalError):
+        RetryPolicy(fatal=(FatalError,)).run("stage", func)
+    assert len(calls) == 1
+
+
+def test_check_stops_retrying():
+    def check(e: Exception):
+        raise FatalError() from e
+
+    func, calls = failing([ValueError()] * 5)
+    with pytest.raises(FatalError):
+        RetryPolicy(check=check).run("stage", func)
+    assert len(calls) == 1
+
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(threshold=2, cooldown=60)
+    breaker.record_failure("a")
+    assert breaker.allow("a")
+    breaker.record_failure("a")
+    assert not breaker.allow("a")
+    assert breaker.allow("b")
+    assert 0 < breaker.wait_time() <= 60
+
+
+def test_breaker_allows_after_cooldown(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(time, "time", lambda: now)
+    breaker = CircuitBreaker(threshold=1, cooldown=60)
+    breaker.record_failure("a")
+    assert not breaker.allow("a")
+    now += 60
+    assert breaker.allow("a")
+    assert breaker.wait_time() == 0
+
+
+def test_breaker_success_resets():
+    breaker = CircuitBreaker(threshold=1, cooldown=60)
+    breaker.record_failure("a")
+    breaker.record_success("a")
+    assert breaker.allow("a")
+    assert breaker.wait_time() == 0
+
+
+def test_breaker_gives_up_and_resets(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(time, "time", lambda: now)
+    breaker = CircuitBreaker(threshold=1, cooldown=10, max_trips=2, reset=100)
+    breaker.record_failure("a")
+    now += 10
+    breaker.record_failure("a")
+    assert breaker.is_given_up("a")
+    # 已放弃的账号不影响等待时间
+    assert breaker.wait_time() == 0
+    now += 100
+    assert not breaker.is_given_up("a")
+    assert breaker.allow("a")
+
+
+def test_breaker_wait_time_ignores_stale_entries(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(time, "time", lambda: now)
+    breaker = CircuitBreaker(threshold=1, cooldown=60)
+    breaker.record_failure("a")
+    now += 50
+    breaker.record_failure("b")
+    now += 20
+    assert breaker.wait_time() == pytest.approx(40)
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = ReviewHistory(tmp_path / "history.json", max_interval=120)
+    for latency in range(100, 200, 10):
+        history.record("a", "final", latency)
+    return history
+
+
+def test_next_delay_without_history(history):
+    assert history.next_delay("a", "temp", 0, 5) is None
+
+
+def test_next_delay_before_low_percentile(history):
+    assert history.next_delay("a", "final", 20, 5) == 80
+    assert history.next_delay("a", "final", 98, 5) == 5
+
+
+def test_next_delay_between_percentiles(history):
+    assert history.next_delay("a", "final", 150, 5) == 5
+
+
+def test_next_delay_after_high_percentile(history):
+    assert history.next_delay("a", "final", 200, 5) == 10
+    assert history.next_delay("a", "final", 1000, 5) == 120
+
+
+def test_history_falls_back_to_all_accounts(history):
+    assert history.next_delay("b", "final", 150, 5) == 5
+
+
+def test_history_persisted(history, tmp_path):
+    reloaded = ReviewHistory(tmp_path / "history.json")
+    assert reloaded.samples("a", "final") == history.samples("a", "final")